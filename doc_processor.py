@@ -1,4 +1,5 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 import json
 from unstructured_client import UnstructuredClient
@@ -22,6 +23,7 @@ async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
         raise ValueError("UNSTRUCTURED_API_KEY environment variable is required")
 
     client = UnstructuredClient(api_key_auth=api_key)
+    os.makedirs(PROCESSED_FILES_FOLDER, exist_ok=True)
     try:
         yield AppContext(client=client)
     finally:
@@ -33,6 +35,16 @@ async def app_lifespan(server: FastMCP) -> AsyncIterator[AppContext]:
 mcp = FastMCP("unstructured-mcp", lifespan=app_lifespan, dependencies=["unstructured-client", "python-dotenv"])
 # Local directory to store processed files
 PROCESSED_FILES_FOLDER = "processed_files"
+# File extensions accepted by the Unstructured partition API
+SUPPORTED_EXTENSIONS = frozenset({
+    ".abw", ".bmp", ".csv", ".cwk", ".dbf", ".dif", ".doc", ".docm", ".docx", ".dot",
+    ".dotm", ".eml", ".epub", ".et", ".eth", ".fods", ".gif", ".heic", ".htm", ".html",
+    ".hwp", ".jpeg", ".jpg", ".md", ".mcw", ".mw", ".odt", ".org", ".p7s", ".pages",
+    ".pbd", ".pdf", ".png", ".pot", ".potm", ".ppt", ".pptm", ".pptx", ".prn", ".rst",
+    ".rtf", ".sdp", ".sgl", ".svg", ".sxg", ".tiff", ".txt", ".tsv", ".uof", ".uos1",
+    ".uos2", ".web", ".webp", ".wk2", ".xls", ".xlsb", ".xlsm", ".xlsx", ".xlw", ".xml",
+    ".zabw",
+})
 
 
 def load_environment_variables() -> None:
@@ -50,34 +62,41 @@ def load_environment_variables() -> None:
             raise ValueError(f"Missing required environment variable: {var}")
 
 
+# Format strings for element types rendered as HTML-ish text
+ELEMENT_FORMATS = {
+    "Title": "<h1> {}</h1><br>",
+    "Header": "<h2> {}</h2><br/>",
+    "NarrativeText": "<p>{}</p>",
+    "UncategorizedText": "<p>{}</p>",
+    "ListItem": "<li>{}</li>",
+    "PageNumber": "Page number: {}",
+}
+
+
+def element_to_text(element: dict) -> str:
+    element_type = element.get("type", "")
+    if element_type == "Table":
+        return element.get("metadata", {}).get("text_as_html", "")  # Keep the table as HTML
+
+    text = element.get("text", "").strip()
+    fmt = ELEMENT_FORMATS.get(element_type)
+    return fmt.format(text) if fmt else text
+
+
+def elements_to_text(elements: list[dict]) -> str:
+    return " ".join([element_to_text(element) for element in elements])
+
+
 def json_to_text(file_path) -> str:
     with open(file_path, 'r') as file:
         elements = json.load(file)
 
-    doc_texts = []
-
-    for element in elements:
-        text = element.get("text", "").strip()
-        element_type = element.get("type", "")
-        metadata = element.get("metadata", {})
+    return elements_to_text(elements)
 
-        if element_type == "Title":
-            doc_texts.append(f"<h1> {text}</h1><br>")
-        elif element_type == "Header":
-            doc_texts.append(f"<h2> {text}</h2><br/>")
-        elif element_type == "NarrativeText" or element_type == "UncategorizedText":
-            doc_texts.append(f"<p>{text}</p>")
-        elif element_type == "ListItem":
-            doc_texts.append(f"<li>{text}</li>")
-        elif element_type == "PageNumber":
-            doc_texts.append(f"Page number: {text}")
-        elif element_type == "Table":
-            table_html = metadata.get("text_as_html", "")
-            doc_texts.append(table_html)  # Keep the table as HTML
-        else:
-            doc_texts.append(text)
 
-    return " ".join(doc_texts)
+def write_elements_json(file_path, elements: list[dict]) -> None:
+    with open(file_path, "w") as file:
+        json.dump(elements, file, indent=2)
 
 
 @mcp.tool()
@@ -92,42 +111,32 @@ async def process_document(ctx: Context, filepath: str) -> str:
         return "File does not exist"
 
     # Check is file extension is supported
-    _, ext = os.path.splitext(filepath)
-    supported_extensions = {".abw", ".bmp", ".csv", ".cwk", ".dbf", ".dif", ".doc", ".docm", ".docx", ".dot",
-                            ".dotm", ".eml", ".epub", ".et", ".eth", ".fods", ".gif", ".heic", ".htm", ".html",
-                            ".hwp", ".jpeg", ".jpg", ".md", ".mcw", ".mw", ".odt", ".org", ".p7s", ".pages",
-                            ".pbd", ".pdf", ".png", ".pot", ".potm", ".ppt", ".pptm", ".pptx", ".prn", ".rst",
-                            ".rtf", ".sdp", ".sgl", ".svg", ".sxg", ".tiff", ".txt", ".tsv", ".uof", ".uos1",
-                            ".uos2", ".web", ".webp", ".wk2", ".xls", ".xlsb", ".xlsm", ".xlsx", ".xlw", ".xml",
-                            ".zabw"}
-
-    if ext.lower() not in supported_extensions:
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
         return "File extension not supported by Unstructured"
 
     client = ctx.request_context.lifespan_context.client
     file_basename = os.path.basename(filepath)
 
-    req = operations.PartitionRequest(
-        partition_parameters=shared.PartitionParameters(
-            files=shared.Files(
-                content=open(filepath, "rb"),
-                file_name=filepath,
-            ),
-            strategy=shared.Strategy.AUTO,
-        ),
-    )
-
-    os.makedirs(PROCESSED_FILES_FOLDER, exist_ok=True)
-
     try:
-        res = client.general.partition(request=req)
+        with open(filepath, "rb", buffering=1024 * 1024) as file:
+            req = operations.PartitionRequest(
+                partition_parameters=shared.PartitionParameters(
+                    files=shared.Files(
+                        content=file,
+                        file_name=filepath,
+                    ),
+                    strategy=shared.Strategy.AUTO,
+                ),
+            )
+            res = await client.general.partition_async(request=req)
+
         element_dicts = [element for element in res.elements]
-        json_elements = json.dumps(element_dicts, indent=2)
         output_json_file_path = os.path.join(PROCESSED_FILES_FOLDER, f"{file_basename}.json")
-        with open(output_json_file_path, "w") as file:
-            file.write(json_elements)
+        # Serialize and save the elements off the event loop
+        await asyncio.to_thread(write_elements_json, output_json_file_path, element_dicts)
 
-        return json_to_text(output_json_file_path)
+        return elements_to_text(element_dicts)
     except Exception as e:
         return f"The following exception happened during file processing: {e}"
 